@@ -2,19 +2,180 @@
 # A comprehensive application to track daily reading progress with analytics
 
 import sqlite3
-from flask import Flask, render_template, request, jsonify
-from datetime import datetime, timedelta
+import queue
+import threading
+import orjson
+from contextlib import contextmanager
+from functools import wraps
+from flask import Flask, Response, render_template, request, jsonify
+from flask_compress import Compress
+from datetime import date, datetime, timedelta
 import json
 import os
 
+# numba JIT-compiles the analytics kernels when it is installed; without it
+# they run as plain Python over lists
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that leaves the function untouched"""
+        return lambda func: func
+
 app = Flask(__name__)
+Compress(app)
+
+# Open connections are reused across requests instead of reconnecting each time
+_pool = queue.LifoQueue(maxsize=8)
+
+# Queries live in module constants so every pooled connection looks up the
+# same strings in its prepared statement cache
+INSERT_SESSION_SQL = '''
+    INSERT INTO reading_sessions (date, pages_read, book_title, notes, reading_time)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+DATA_VERSION_SQL = 'SELECT version FROM data_version WHERE id = 1'
+
+STATS_SQL = '''
+    SELECT
+        COALESCE(SUM(pages), 0),
+        COALESCE(SUM(CASE WHEN date >= :week_start THEN pages END), 0),
+        COALESCE(SUM(CASE WHEN date >= :month_start THEN pages END), 0),
+        MIN(date)
+    FROM daily_totals
+'''
+
+# Chart series are serialized by SQLite's JSON functions, one JSON array of
+# [label, pages] rows per query
+DAILY_CHART_SQL = '''
+    SELECT json_group_array(json_array(date, pages))
+    FROM (
+        SELECT date, pages
+        FROM daily_totals
+        WHERE date >= ?
+        ORDER BY date
+    )
+'''
+
+MONTHLY_CHART_SQL = '''
+    SELECT json_group_array(json_array(month, pages))
+    FROM (
+        SELECT
+            strftime('%Y-%m', date) as month,
+            SUM(pages) as pages
+        FROM daily_totals
+        WHERE date >= date('now', '-12 months')
+        GROUP BY strftime('%Y-%m', date)
+        ORDER BY month
+    )
+'''
+
+BOOK_CHART_SQL = '''
+    SELECT json_group_array(json_array(book, pages))
+    FROM (
+        SELECT book, pages
+        FROM book_totals
+        ORDER BY pages DESC
+        LIMIT 10
+    )
+'''
+
+# Fallback values are applied here so rows can be returned as-is
+RECENT_SESSIONS_SQL = '''
+    SELECT
+        date,
+        pages_read,
+        book_title,
+        COALESCE(notes, '') as notes,
+        COALESCE(reading_time, 0) as reading_time
+    FROM reading_sessions
+    ORDER BY date DESC, created_at DESC
+    LIMIT 10
+'''
+
+# Consecutive days share the same julianday - row_number value, so the
+# streak is the size of the group that contains today
+STREAK_SQL = '''
+    WITH reading_days AS (
+        SELECT date
+        FROM daily_totals
+        WHERE pages > 0 AND date <= :today
+    ),
+    groups AS (
+        SELECT date, julianday(date) - ROW_NUMBER() OVER (ORDER BY date) AS grp
+        FROM reading_days
+    )
+    SELECT COUNT(*)
+    FROM groups
+    WHERE grp = (SELECT grp FROM groups WHERE date = :today)
+'''
+
+STREAK_SCAN_SQL = '''
+    SELECT CAST(julianday(:today) - julianday(date) AS INTEGER)
+    FROM daily_totals
+    WHERE pages > 0 AND date <= :today
+    ORDER BY date DESC
+'''
+
+READING_VELOCITY_SQL = '''
+    SELECT AVG(pages_read) as avg_pages, COUNT(*) as reading_days
+    FROM reading_sessions
+    WHERE date >= ? AND pages_read > 0
+'''
+
+ROLLING_VELOCITY_SQL = 'SELECT date, pages FROM daily_totals ORDER BY date'
+
+READING_PATTERNS_SQL = '''
+    SELECT
+        CASE strftime('%w', date)
+            WHEN '0' THEN 'Sunday'
+            WHEN '1' THEN 'Monday'
+            WHEN '2' THEN 'Tuesday'
+            WHEN '3' THEN 'Wednesday'
+            WHEN '4' THEN 'Thursday'
+            WHEN '5' THEN 'Friday'
+            WHEN '6' THEN 'Saturday'
+        END as day_name,
+        AVG(pages_read) as avg_pages,
+        COUNT(*) as sessions
+    FROM reading_sessions
+    GROUP BY strftime('%w', date)
+    ORDER BY strftime('%w', date)
+'''
+
+# Serialized responses of read-only endpoints keyed by (path, data version,
+# day); only entries for the newest version and day seen are kept
+_cache = {}
+_cache_key = None
+_cache_lock = threading.Lock()
 
 # Database setup
+# Bump when init_db gains schema changes; databases stamped with an older
+# PRAGMA user_version are migrated on the next start
+SCHEMA_VERSION = 1
+
 def init_db():
-    """Initialize the SQLite database"""
-    conn = sqlite3.connect('reading_tracker.db')
+    """Initialize the SQLite database, running the schema DDL at most once"""
+    conn = sqlite3.connect('reading_tracker.db', isolation_level=None)
     cursor = conn.cursor()
     
+    # WAL lets the dashboard read while a session is being logged, and lets
+    # every gunicorn worker read concurrently; it cannot change inside a
+    # transaction, so it is set before the migration starts
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
+    # The DDL, backfills and user_version stamp below commit together
+    cursor.execute('BEGIN IMMEDIATE')
+    
+    if cursor.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+        cursor.execute('ROLLBACK')
+        conn.close()
+        return
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS reading_sessions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -38,189 +199,398 @@ def init_db():
         )
     ''')
     
-    conn.commit()
+    # Date filters and groupings use this index, which also covers
+    # SUM(pages_read) so those queries never touch the table
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_date_pages ON reading_sessions(date, pages_read)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_book ON reading_sessions(book_title, pages_read)')
+    # Lets the recent-sessions query read its 10 rows straight off the index
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_recent ON reading_sessions(date DESC, created_at DESC)')
+    # Both indexes above lead on date, so a plain date index only slows inserts
+    cursor.execute('DROP INDEX IF EXISTS idx_sessions_date')
+
+    # Sessions without a title are stored as 'Unspecified' so book queries can
+    # group on the plain column; normalize rows logged before that rule
+    cursor.execute('''
+        UPDATE reading_sessions SET book_title = 'Unspecified'
+        WHERE book_title IS NULL OR TRIM(book_title) = ''
+    ''')
+
+    # Per-day page totals, kept in sync by the triggers below so the stats
+    # and chart endpoints never re-aggregate every session
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            date TEXT PRIMARY KEY,
+            pages INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_totals_insert
+        AFTER INSERT ON reading_sessions
+        BEGIN
+            INSERT INTO daily_totals (date, pages) VALUES (NEW.date, NEW.pages_read)
+            ON CONFLICT(date) DO UPDATE SET pages = pages + NEW.pages_read;
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_totals_delete
+        AFTER DELETE ON reading_sessions
+        BEGIN
+            UPDATE daily_totals SET pages = pages - OLD.pages_read WHERE date = OLD.date;
+            DELETE FROM daily_totals
+            WHERE date = OLD.date
+              AND NOT EXISTS (SELECT 1 FROM reading_sessions WHERE date = OLD.date);
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_totals_update
+        AFTER UPDATE OF date, pages_read ON reading_sessions
+        BEGIN
+            UPDATE daily_totals SET pages = pages - OLD.pages_read WHERE date = OLD.date;
+            DELETE FROM daily_totals
+            WHERE date = OLD.date
+              AND NOT EXISTS (SELECT 1 FROM reading_sessions WHERE date = OLD.date);
+            INSERT INTO daily_totals (date, pages) VALUES (NEW.date, NEW.pages_read)
+            ON CONFLICT(date) DO UPDATE SET pages = pages + NEW.pages_read;
+        END
+    ''')
+
+    # Backfill once for databases created before the rollup existed
+    cursor.execute('''
+        INSERT INTO daily_totals (date, pages)
+        SELECT date, SUM(pages_read)
+        FROM reading_sessions
+        WHERE NOT EXISTS (SELECT 1 FROM daily_totals)
+        GROUP BY date
+    ''')
+
+    # Per-book page totals for the top-books chart, maintained the same way;
+    # titles are already normalized so the triggers can seek idx_sessions_book
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS book_totals (
+            book TEXT PRIMARY KEY,
+            pages INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_book_totals_pages ON book_totals(pages DESC)')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_book_totals_insert
+        AFTER INSERT ON reading_sessions
+        BEGIN
+            INSERT INTO book_totals (book, pages)
+            VALUES (NEW.book_title, NEW.pages_read)
+            ON CONFLICT(book) DO UPDATE SET pages = pages + NEW.pages_read;
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_book_totals_delete
+        AFTER DELETE ON reading_sessions
+        BEGIN
+            UPDATE book_totals SET pages = pages - OLD.pages_read
+            WHERE book = OLD.book_title;
+            DELETE FROM book_totals
+            WHERE book = OLD.book_title
+              AND NOT EXISTS (SELECT 1 FROM reading_sessions WHERE book_title = OLD.book_title);
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_book_totals_update
+        AFTER UPDATE OF book_title, pages_read ON reading_sessions
+        BEGIN
+            UPDATE book_totals SET pages = pages - OLD.pages_read
+            WHERE book = OLD.book_title;
+            DELETE FROM book_totals
+            WHERE book = OLD.book_title
+              AND NOT EXISTS (SELECT 1 FROM reading_sessions WHERE book_title = OLD.book_title);
+            INSERT INTO book_totals (book, pages)
+            VALUES (NEW.book_title, NEW.pages_read)
+            ON CONFLICT(book) DO UPDATE SET pages = pages + NEW.pages_read;
+        END
+    ''')
+
+    cursor.execute('''
+        INSERT INTO book_totals (book, pages)
+        SELECT book_title, SUM(pages_read)
+        FROM reading_sessions
+        WHERE NOT EXISTS (SELECT 1 FROM book_totals)
+        GROUP BY book_title
+    ''')
+
+    # Write counter shared by every worker process, so a response cached in one
+    # worker is dropped after a session is logged through another (or the CLI)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)')
+
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_data_version_{event.lower()}
+            AFTER {event} ON reading_sessions
+            BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+    cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    cursor.execute('COMMIT')
     conn.close()
 
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect('reading_tracker.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get a database connection from the pool, opening one if it is empty"""
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        conn = sqlite3.connect(
+            'reading_tracker.db',
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=256
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA cache_size=-20000')
+        return conn
+
+def release_db_connection(conn):
+    """Return a connection to the pool, closing it if the pool is full"""
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+@contextmanager
+def db():
+    """Borrow a pooled connection for the duration of a with-block"""
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        release_db_connection(conn)
+
+def rowset(cursor):
+    """Return a query result as column names plus positional rows"""
+    rows = cursor.fetchall()
+    return {
+        'columns': [column[0] for column in cursor.description],
+        'rows': [tuple(row) for row in rows]
+    }
+
+def json_rowset(conn, sql, columns, params=()):
+    """Like rowset, for queries that return their rows as a single JSON array"""
+    rows_json = conn.execute(sql, params).fetchone()[0]
+    return {
+        'columns': columns,
+        'rows': orjson.Fragment(rows_json)
+    }
+
+def store_cached(key, body):
+    """Cache a response body unless a newer data version or day is cached"""
+    global _cache_key
+    
+    path, version, today = key
+    with _cache_lock:
+        if _cache_key is not None:
+            newest_version, newest_day = _cache_key
+            # Built from an older snapshot than one already cached; storing it
+            # could serve stale data under a newer ETag
+            if version < newest_version or today < newest_day:
+                return
+            if (version, today) != _cache_key:
+                for stale in [k for k in _cache if k[1:] != (version, today)]:
+                    del _cache[stale]
+        
+        _cache_key = (version, today)
+        _cache[key] = body
+
+def cached_json(view):
+    """Serve a view's JSON body from the cache until the data changes"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with db() as conn:
+            # The version and the view's queries share one read snapshot, so a
+            # body is always cached under the version it was built from
+            conn.execute('BEGIN')
+            
+            # Today's date is part of the key because streaks and week/month
+            # totals roll over at midnight even without new writes
+            version, today = conn.execute(DATA_VERSION_SQL).fetchone()[0], date.today()
+            etag = f'{version}-{today.isoformat()}'
+            
+            # The client already has this version, skip building the body.
+            # Flask-Compress appends ':gzip'/':br' to the tags it sends out
+            client_tags = request.if_none_match.as_set(include_weak=True)
+            if any(tag.split(':', 1)[0] == etag for tag in client_tags):
+                response = Response(status=304)
+            else:
+                key = (request.path, version, today)
+                body = _cache.get(key)
+                if body is None:
+                    body = orjson.dumps(view(conn, *args, **kwargs))
+                    store_cached(key, body)
+                response = Response(body, mimetype='application/json')
+            
+            conn.execute('COMMIT')
+        
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
 
 @app.route('/')
 def index():
     """Main dashboard page"""
     return render_template('index.html')
 
+def session_params(data):
+    """Build INSERT_SESSION_SQL parameters from a logged session's JSON"""
+    return (
+        data['date'],
+        data['pages_read'],
+        (data.get('book_title') or '').strip() or 'Unspecified',
+        data.get('notes', ''),
+        data.get('reading_time', 0)
+    )
+
 @app.route('/api/log_reading', methods=['POST'])
 def log_reading():
     """Log a reading session"""
     data = request.json
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO reading_sessions (date, pages_read, book_title, notes, reading_time)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            data['date'],
-            data['pages_read'],
-            data.get('book_title', ''),
-            data.get('notes', ''),
-            data.get('reading_time', 0)
-        ))
+        params = session_params(data)
         
-        conn.commit()
-        session_id = cursor.lastrowid
-        conn.close()
+        with db() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute(INSERT_SESSION_SQL, params)
+            conn.execute('COMMIT')
+            session_id = cursor.lastrowid
         
         return jsonify({'success': True, 'session_id': session_id})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/log_reading_batch', methods=['POST'])
+def log_reading_batch():
+    """Log a list of reading sessions in a single transaction"""
+    data = request.json
+    
+    try:
+        params = [session_params(session) for session in data]
+        
+        with db() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(INSERT_SESSION_SQL, params)
+            conn.execute('COMMIT')
+        
+        return jsonify({'success': True, 'count': len(params)})
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/api/get_stats')
-def get_stats():
+@cached_json
+def get_stats(conn):
     """Get reading statistics"""
-    conn = get_db_connection()
+    today = date.today()
+    week_start = (today - timedelta(days=today.weekday())).isoformat()
+    month_start = today.replace(day=1).isoformat()
     
-    # Get total pages read
-    total_pages = conn.execute('SELECT SUM(pages_read) FROM reading_sessions').fetchone()[0] or 0
+    # Get total, this week's and this month's pages plus the first entry in one scan
+    total_pages, week_pages, month_pages, first_entry = conn.execute(
+        STATS_SQL, {'week_start': week_start, 'month_start': month_start}
+    ).fetchone()
     
     # Get current streak
     streak = calculate_reading_streak(conn)
     
-    # Get this week's reading
-    week_start = (datetime.now() - timedelta(days=datetime.now().weekday())).strftime('%Y-%m-%d')
-    week_pages = conn.execute(
-        'SELECT SUM(pages_read) FROM reading_sessions WHERE date >= ?', 
-        (week_start,)
-    ).fetchone()[0] or 0
-    
-    # Get this month's reading
-    month_start = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-    month_pages = conn.execute(
-        'SELECT SUM(pages_read) FROM reading_sessions WHERE date >= ?', 
-        (month_start,)
-    ).fetchone()[0] or 0
-    
     # Get average pages per day
-    first_entry = conn.execute('SELECT MIN(date) FROM reading_sessions').fetchone()[0]
     if first_entry:
-        days_since_start = (datetime.now() - datetime.strptime(first_entry, '%Y-%m-%d')).days + 1
+        days_since_start = (today - date.fromisoformat(first_entry)).days + 1
         avg_pages = total_pages / days_since_start if days_since_start > 0 else 0
     else:
         avg_pages = 0
     
-    conn.close()
-    
-    return jsonify({
+    return {
         'total_pages': total_pages,
         'current_streak': streak,
         'week_pages': week_pages,
         'month_pages': month_pages,
         'avg_pages_per_day': round(avg_pages, 1)
-    })
+    }
 
 @app.route('/api/get_chart_data')
-def get_chart_data():
+@cached_json
+def get_chart_data(conn):
     """Get data for charts"""
-    conn = get_db_connection()
-    
     # Last 30 days data
     thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-    daily_data = conn.execute('''
-        SELECT date, SUM(pages_read) as pages
-        FROM reading_sessions 
-        WHERE date >= ?
-        GROUP BY date
-        ORDER BY date
-    ''', (thirty_days_ago,)).fetchall()
+    daily_data = json_rowset(conn, DAILY_CHART_SQL, ['date', 'pages'], (thirty_days_ago,))
     
     # Monthly data for the year
-    monthly_data = conn.execute('''
-        SELECT 
-            strftime('%Y-%m', date) as month,
-            SUM(pages_read) as pages
-        FROM reading_sessions 
-        WHERE date >= date('now', '-12 months')
-        GROUP BY strftime('%Y-%m', date)
-        ORDER BY month
-    ''').fetchall()
+    monthly_data = json_rowset(conn, MONTHLY_CHART_SQL, ['month', 'pages'])
     
     # Book distribution
-    book_data = conn.execute('''
-        SELECT 
-            CASE 
-                WHEN book_title = '' OR book_title IS NULL THEN 'Unspecified'
-                ELSE book_title
-            END as book,
-            SUM(pages_read) as pages
-        FROM reading_sessions
-        GROUP BY book
-        ORDER BY pages DESC
-        LIMIT 10
-    ''').fetchall()
-    
-    conn.close()
+    book_data = json_rowset(conn, BOOK_CHART_SQL, ['book', 'pages'])
     
-    return jsonify({
-        'daily': [{'date': row['date'], 'pages': row['pages']} for row in daily_data],
-        'monthly': [{'month': row['month'], 'pages': row['pages']} for row in monthly_data],
-        'books': [{'book': row['book'], 'pages': row['pages']} for row in book_data]
-    })
+    return {
+        'daily': daily_data,
+        'monthly': monthly_data,
+        'books': book_data
+    }
 
 @app.route('/api/get_recent_sessions')
-def get_recent_sessions():
+@cached_json
+def get_recent_sessions(conn):
     """Get recent reading sessions"""
-    conn = get_db_connection()
-    
-    sessions = conn.execute('''
-        SELECT date, pages_read, book_title, notes, reading_time
-        FROM reading_sessions
-        ORDER BY date DESC, created_at DESC
-        LIMIT 10
-    ''').fetchall()
-    
-    conn.close()
-    
-    return jsonify([{
-        'date': session['date'],
-        'pages_read': session['pages_read'],
-        'book_title': session['book_title'] or 'Unspecified',
-        'notes': session['notes'] or '',
-        'reading_time': session['reading_time'] or 0
-    } for session in sessions])
+    return rowset(conn.execute(RECENT_SESSIONS_SQL))
 
 def calculate_reading_streak(conn):
     """Calculate current reading streak"""
-    today = datetime.now().strftime('%Y-%m-%d')
-    streak = 0
-    current_date = datetime.now()
+    # Window functions need SQLite 3.25+; older libraries use the Python scan
+    if sqlite3.sqlite_version_info < (3, 25, 0):
+        return _calculate_reading_streak_scan(conn)
     
-    while True:
-        date_str = current_date.strftime('%Y-%m-%d')
-        pages = conn.execute(
-            'SELECT SUM(pages_read) FROM reading_sessions WHERE date = ?', 
-            (date_str,)
-        ).fetchone()[0] or 0
-        
-        if pages > 0:
-            streak += 1
-        else:
+    return conn.execute(STREAK_SQL, {'today': date.today().isoformat()}).fetchone()[0]
+
+def _calculate_reading_streak_scan(conn):
+    """Calculate current reading streak by walking reading days in Python"""
+    # SQLite returns each reading day as a whole-day offset from today, so
+    # the loop only compares integers instead of doing date arithmetic
+    rows = conn.execute(STREAK_SCAN_SQL, {'today': date.today().isoformat()}).fetchall()
+    
+    streak = 0
+    for (offset,) in rows:
+        if offset != streak:
             break
-            
-        current_date -= timedelta(days=1)
+        streak += 1
     
     return streak
 
-if __name__ == '__main__':
-    init_db()
-    app.run(debug=True)
-
 # Additional utility functions for data analysis
+@njit(cache=True)
+def _rolling_mean(pages, window, out):
+    """Fill out with the mean of each value and up to window - 1 before it"""
+    total = 0.0
+    for i in range(len(pages)):
+        total += pages[i]
+        if i >= window:
+            total -= pages[i - window]
+        out[i] = total / min(i + 1, window)
+    return out
+
 class ReadingAnalytics:
     """Advanced analytics for reading data"""
     
@@ -229,11 +599,7 @@ class ReadingAnalytics:
         """Calculate reading velocity over specified days"""
         cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
         
-        result = conn.execute('''
-            SELECT AVG(pages_read) as avg_pages, COUNT(*) as reading_days
-            FROM reading_sessions 
-            WHERE date >= ? AND pages_read > 0
-        ''', (cutoff_date,)).fetchone()
+        result = conn.execute(READING_VELOCITY_SQL, (cutoff_date,)).fetchone()
         
         return {
             'avg_pages_per_session': round(result['avg_pages'] or 0, 1),
@@ -241,26 +607,34 @@ class ReadingAnalytics:
             'period_days': days
         }
     
+    @staticmethod
+    def get_rolling_velocity(conn, window=7):
+        """Calculate the moving average of pages over the last window reading days"""
+        # _rolling_mean divides by window and indexes pages[i - window]; a
+        # non-positive window would divide by zero or read past the array
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}")
+        
+        rows = conn.execute(ROLLING_VELOCITY_SQL).fetchall()
+        
+        if np is not None:
+            pages = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+            out = np.empty(len(rows), dtype=np.float64)
+        else:
+            pages = [row[1] for row in rows]
+            out = [0.0] * len(rows)
+        
+        averages = _rolling_mean(pages, window, out)
+        
+        return [{
+            'date': row[0],
+            'avg_pages': round(float(avg), 1)
+        } for row, avg in zip(rows, averages)]
+    
     @staticmethod
     def get_reading_patterns(conn):
         """Analyze reading patterns by day of week"""
-        result = conn.execute('''
-            SELECT 
-                CASE strftime('%w', date)
-                    WHEN '0' THEN 'Sunday'
-                    WHEN '1' THEN 'Monday'
-                    WHEN '2' THEN 'Tuesday'
-                    WHEN '3' THEN 'Wednesday'
-                    WHEN '4' THEN 'Thursday'
-                    WHEN '5' THEN 'Friday'
-                    WHEN '6' THEN 'Saturday'
-                END as day_name,
-                AVG(pages_read) as avg_pages,
-                COUNT(*) as sessions
-            FROM reading_sessions
-            GROUP BY strftime('%w', date)
-            ORDER BY strftime('%w', date)
-        ''').fetchall()
+        result = conn.execute(READING_PATTERNS_SQL).fetchall()
         
         return [{
             'day': row['day_name'],
@@ -280,19 +654,13 @@ def cli_log_reading():
     
     try:
         pages = int(input("Pages read: "))
-        book = input("Book title (optional): ").strip()
+        book = input("Book title (optional): ").strip() or 'Unspecified'
         notes = input("Notes (optional): ").strip()
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO reading_sessions (date, pages_read, book_title, notes)
-            VALUES (?, ?, ?, ?)
-        ''', (date, pages, book, notes))
-        
-        conn.commit()
-        conn.close()
+        with db() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(INSERT_SESSION_SQL, (date, pages, book, notes, 0))
+            conn.execute('COMMIT')
         
         print(f"✓ Logged {pages} pages for {date}")
         
@@ -307,4 +675,5 @@ if __name__ == "__main__":
         cli_log_reading()
     else:
         init_db()
-        app.run(debug=True)
\ No newline at end of file
+        print("Database ready. Serve the app with:")
+        print("  gunicorn -c gunicorn.conf.py app:app")
\ No newline at end of file
@@ -0,0 +1,18 @@
+# Gunicorn settings for the Reading Habit Tracker
+# Run with: gunicorn -c gunicorn.conf.py app:app
+
+bind = '127.0.0.1:8000'
+
+# Pre-forked workers, each with its own connection pool and a few threads,
+# so concurrent dashboard polls are served in parallel
+workers = 4
+worker_class = 'gthread'
+threads = 4
+
+# Keep the dashboard's polling connections open between requests
+keepalive = 30
+
+def on_starting(server):
+    """Create or migrate the database once, before the workers fork"""
+    from app import init_db
+    init_db()